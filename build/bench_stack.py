@@ -0,0 +1,260 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from stack.component import Stack
+from stack.profiler import PROFILER
+from stack.structured_data import dump_dict, load_dict
+from stack.util import mkdir_p, rm_rf, run
+
+GROUP = 'generic'
+MODULE_GROUP = 'synthetic'
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Benchmarks make_stack against synthetic local stacks')
+    parser.add_argument('--commands', type=int, default=200,
+                        help='number of core commands (modules get a quarter each)')
+    parser.add_argument('--docs', type=int, default=500,
+                        help='number of core docs (modules get a quarter each)')
+    parser.add_argument('--examples', type=int, default=50,
+                        help='number of client examples')
+    parser.add_argument('--modules', type=int, default=2,
+                        help='number of modules')
+    parser.add_argument('--scales', type=str, default='1',
+                        help='comma separated multipliers of the stack size')
+    parser.add_argument('--runs', type=int, default=2,
+                        help='builds per scale: the first is cold, the rest are warm')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='make_stack --jobs')
+    parser.add_argument('--workdir', type=str,
+                        help='where stacks are generated (defaults to a temporary path)')
+    parser.add_argument('--output', type=str,
+                        help='writes the results to this JSON file')
+    parser.add_argument('--profile', type=str,
+                        help='writes the profile of the last build to this JSON file')
+    parser.add_argument('--baseline', type=str,
+                        help='results JSON to compare with - exits with 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown over the baseline')
+    parser.add_argument('--loglevel', type=str,
+                        default='WARNING',
+                        help='Python logging level (overwrites LOGLEVEL env var)')
+    return parser.parse_args()
+
+
+def git_repo(path: str, files: dict) -> str:
+    """ Creates a bare repository at `path`.git with a single commit of `files` """
+    rm_rf(path)
+    for name, content in files.items():
+        mkdir_p(os.path.dirname(f'{path}/{name}'))
+        with open(f'{path}/{name}', 'w') as f:
+            f.write(content if type(content) is str else json.dumps(content, indent=4))
+    run('git init --quiet -b master && git add . && '
+        'git -c user.name=bench -c user.email=bench@localhost commit --quiet -m synthetic', cwd=path)
+    rm_rf(f'{path}.git')
+    run(f'git clone --quiet --bare {path} {path}.git')
+    return f'file://{os.path.abspath(path)}.git'
+
+
+def letters(i: int) -> str:
+    """ Spells a number with letters, since command names have no digits """
+    s = ''
+    while True:
+        s = chr(ord('A') + i % 26) + s
+        i = i // 26 - 1
+        if i < 0:
+            return s
+
+
+def make_commands(prefix: str, n: int, group: str) -> dict:
+    commands = {}
+    for i in range(n):
+        commands[f'{prefix}{letters(i)}'] = {
+            'summary': f'Synthetic command {i}',
+            'since': f'{1 + i % 7}.{i % 4}.0',
+            'group': group,
+            'arity': -2,
+            'arguments': [
+                {'name': 'key', 'type': 'key'},
+                {'name': 'count', 'type': 'integer', 'token': 'COUNT', 'optional': True},
+                {'name': 'mode', 'type': 'oneof', 'optional': True, 'arguments': [
+                    {'name': 'fast', 'type': 'pure-token', 'token': 'FAST'},
+                    {'name': 'slow', 'type': 'pure-token', 'token': 'SLOW'},
+                ]},
+            ],
+        }
+    return commands
+
+
+def make_page(title: str, i: int, names: list) -> str:
+    refs = ' '.join([f'`{names[(i * 7 + j) % len(names)]}`' for j in range(5)]) if names else ''
+    body = '\n'.join([f'Paragraph {j} about {title}, see {refs} and [more](/docs/page{j}).'
+                      for j in range(20)])
+    return f'---\ntitle: "{title}"\nweight: {i}\n---\n\n{body}\n\n```cli\nPING\n```\n'
+
+
+def make_stack(root: str, scale: int, args: argparse.Namespace) -> str:
+    """ Generates a synthetic stack definition and its repositories, returns its index path """
+    repos = f'{root}/repos'
+    defs = f'{root}/stack'
+    mkdir_p(defs)
+    ncommands, ndocs = args.commands * scale, args.docs * scale
+
+    core_cmds = make_commands('CMD', ncommands, GROUP)
+    files = {
+        'commands.json': core_cmds,
+        'commands/_index.md': make_page('Commands', 0, []),
+        'redis.conf': '# synthetic redis.conf\n' + 'save 3600 1\n' * 100,
+        'languages.json': ['Python'],
+        'tool_types.json': ['cli'],
+        'resp2_replies.json': {},
+        'resp3_replies.json': {},
+        '_index.md': make_page('Home', 0, []),
+        'docs/management/config-file.md': '---\ntitle: config\n---\n',
+    }
+    names = list(core_cmds)
+    for i, name in enumerate(names):
+        files[f'commands/{name.lower()}.md'] = make_page(name, i, names) + '\n@examples\n\n@return\n\n@integer-reply\n'
+    for i in range(ndocs):
+        files[f'docs/section{i % 10}/page{i}.md'] = make_page(f'Page {i}', i, names)
+    for kind in ['clients', 'libraries', 'modules', 'tools']:
+        for i in range(max(1, scale * 5)):
+            files[f'{kind}/Python/github.com/synthetic/{kind}{i}.json'] = {'name': f'{kind} {i}'}
+    core_uri = git_repo(f'{repos}/core', files)
+    dump_dict(f'{defs}/core.json', {
+        'id': 'core', 'type': 'core', 'name': 'Core', 'stack_path': 'docs',
+        'repository': {'git_uri': core_uri, 'dev_branch': 'master'},
+        'config_file_template': 'management/config-file.md',
+        'commands': {'git_uri': core_uri, 'dev_branch': 'master', 'defs': 'commands.json',
+                     'path': 'commands', 'payload': [{'src': '_index.md'}]},
+        'groups': {GROUP: {'display': 'Generic', 'description': 'Generic commands', 'weight': 0}},
+        'docs': {'git_uri': core_uri, 'dev_branch': 'master', 'path': 'docs'},
+        'data': {'git_uri': core_uri, 'dev_branch': 'master', 'languages': 'languages.json',
+                 'resp2_replies': 'resp2_replies.json', 'resp3_replies': 'resp3_replies.json',
+                 'tool_types': 'tool_types.json', 'clients': 'clients/', 'libraries': 'libraries/',
+                 'modules': 'modules/', 'tools': 'tools/'},
+        'misc': {'git_uri': core_uri, 'dev_branch': 'master', 'payload': [{'src': '_index.md'}]},
+    })
+
+    modules = []
+    for m in range(args.modules):
+        mid = f'module{m}'
+        cmds = make_commands(f'M{letters(m)}.CMD', max(1, ncommands // 4), f'{MODULE_GROUP}{m}')
+        files = {'commands.json': cmds, 'docs/index.md': make_page(mid, 0, [])}
+        for i, name in enumerate(cmds):
+            files[f'commands/{name.lower()}.md'] = make_page(name, i, list(cmds))
+        for i in range(max(1, ndocs // 4)):
+            files[f'docs/page{i}.md'] = make_page(f'{mid} page {i}', i, list(cmds))
+        uri = git_repo(f'{repos}/{mid}', files)
+        dump_dict(f'{defs}/{mid}.json', {
+            'id': mid, 'type': 'module', 'name': mid, 'description': f'Synthetic module {m}',
+            'stack_path': f'docs/modules/{mid}', 'stack_weight': m,
+            'commands': {'git_uri': uri, 'dev_branch': 'master', 'defs': 'commands.json', 'path': 'commands'},
+            'groups': {f'{MODULE_GROUP}{m}': {'display': mid, 'description': f'{mid} commands'}},
+            'docs': {'git_uri': uri, 'dev_branch': 'master', 'path': 'docs'},
+        })
+        modules.append(mid)
+
+    files = {}
+    for i in range(args.examples * scale):
+        steps = '\n'.join([f'# STEP_START step{j}\nr.set("k{j}", {j})\n# STEP_END' for j in range(3)])
+        files[f'doctests/example{i}.py'] = (
+            f'# EXAMPLE: example{i}\n# HIDE_START\nimport redis\nr = redis.Redis()\n# HIDE_END\n'
+            f'{steps}\n# REMOVE_START\nassert True\n# REMOVE_END\n')
+    uri = git_repo(f'{repos}/client', files)
+    dump_dict(f'{defs}/client.json', {
+        'id': 'client', 'type': 'client', 'name': 'client', 'language': 'Python',
+        'examples': {'git_uri': uri, 'dev_branch': 'master', 'path': 'doctests', 'pattern': '*.py'},
+    })
+
+    index = f'{defs}/index.json'
+    dump_dict(index, {
+        'id': 'synthetic', 'name': 'Synthetic stack', 'type': 'stack',
+        'core': ['core'], 'docs': [], 'clients': ['client'], 'modules': modules, 'assets': [],
+        'website': {
+            'path': './', 'content': 'content/en', 'examples': 'data/examples.json',
+            'examples_path': 'examples', 'commands': 'data/commands.json',
+            'groups': 'data/groups.json', 'versions': 'data/versions.json',
+            'repos': 'data/repos.json', 'meta': 'data/meta.json',
+        },
+    })
+    return index
+
+
+def build(root: str, index: str, jobs: int) -> dict:
+    """ Builds the stack in its site directory and returns the profile """
+    site = f'{root}/site'
+    mkdir_p(f'{site}/data')
+    if not os.path.isfile(f'{site}/data/meta.json'):
+        dump_dict(f'{site}/data/meta.json', {})
+    d0 = os.getcwd()
+    os.chdir(site)
+    try:
+        PROFILER.reset()
+        start = time.perf_counter()
+        stack = Stack(index, None, {
+            'stack': index, 'module': '*', 'jobs': jobs,
+            'tempdir': f'{root}/tmp', 'cachedir': f'{root}/cache',
+            'manifest': './tmp/build-manifest.json', 'diagrams': './tmp/diagram-cache.json',
+            'examples_cache': './tmp/example-cache.json',
+        })
+        stack.apply()
+        seconds = time.perf_counter() - start
+    finally:
+        os.chdir(d0)
+    report = PROFILER.report()
+    report['seconds'] = seconds
+    return report
+
+
+if __name__ == '__main__':
+    ARGS = parse_args()
+    logging.basicConfig(
+        level=ARGS.loglevel, format=f'{sys.argv[0]}: %(levelname)s %(asctime)s %(message)s')
+    workdir = os.path.abspath(ARGS.workdir or tempfile.mkdtemp(prefix='bench-stack-'))
+    print(f'BENCH STACK in {workdir}')
+
+    results = []
+    report = None
+    for scale in [int(s) for s in ARGS.scales.split(',')]:
+        root = f'{workdir}/x{scale}'
+        rm_rf(root)
+        index = make_stack(root, scale, ARGS)
+        for i in range(ARGS.runs):
+            report = build(root, index, ARGS.jobs)
+            counters = report.get('counters')
+            result = {
+                'scale': scale,
+                'run': 'cold' if i == 0 else 'warm',
+                'seconds': round(report.get('seconds'), 3),
+                'subprocesses': counters.get('subprocesses'),
+                'bytes_read': counters.get('bytes_read'),
+                'bytes_written': counters.get('bytes_written'),
+            }
+            results.append(result)
+            print(' '.join([f'{k}={v}' for k, v in result.items()]))
+
+    if ARGS.output:
+        mkdir_p(os.path.dirname(ARGS.output))
+        dump_dict(ARGS.output, results)
+    if ARGS.profile and report:
+        PROFILER.persist(ARGS.profile)
+
+    if ARGS.baseline:
+        baseline = {(r.get('scale'), r.get('run')): r for r in load_dict(ARGS.baseline)}
+        regressions = []
+        for r in results:
+            b = baseline.get((r.get('scale'), r.get('run')))
+            if b and r.get('seconds') > b.get('seconds') * (1 + ARGS.tolerance):
+                regressions.append(f'x{r.get("scale")} {r.get("run")}: {b.get("seconds")}s -> {r.get("seconds")}s')
+        if regressions:
+            print('-ERR regressions over baseline:')
+            print('\n'.join(regressions))
+            exit(1)
+    print(f'+OK')
@@ -3,8 +3,8 @@ import logging
 import os
 import sys
 import urllib.error
-from datetime import datetime
-from stack.github import Repository
+from datetime import datetime, timedelta
+from stack.github import GitHub
 from stack.structured_data import load_dict, dump_dict
 from stack.util import die, wget
 
@@ -23,6 +23,16 @@ def get_repositories(args: argparse.Namespace) -> None:
     except urllib.error.URLError:
         meta = {}
         logging.warning(f'Merge metadata not found at {meta_in} - starting from scratch.')
+    # ETags are kept apart from the metadata, which is merged into the resource pages
+    try:
+        etags_in = f'{args.input}{args.etags}'
+        etags_out = f'{args.output}{args.etags}'
+        wget(etags_in, etags_out)
+        etags = load_dict(etags_out)
+        logging.info(f'ETags loaded from {etags_in}.')
+    except urllib.error.URLError:
+        etags = {}
+        logging.warning(f'ETags not found at {etags_in} - fetching without conditional requests.')
     repos_in = f'{args.input}{args.repos}'
     repos_out = f'{args.output}{args.repos}'
     if os.path.exists(repos_out):
@@ -48,19 +58,39 @@ def get_repositories(args: argparse.Namespace) -> None:
                         'open_issues_count': None,
                         'stargazers_count': None
                     }
+    stale = {}
     for repo, data in meta.items():
+        data.pop('etag', None)
         fetched_at = meta[repo].get('fetched_at')
         now = datetime.now().timestamp()
         if not fetched_at or fetched_at + 3600 * args.expire < now:
             if production:
                 logging.info(f'Getting meta for {repo}')
-                data.update(Repository(repo, token))
-                data.update({ 'fetched_at': datetime.now().timestamp() })
+                # A 304 only makes sense for data that was fetched before, e.g. not for placeholders
+                stale[repo] = etags.get(repo) if fetched_at else None
             else:
                 logging.debug(f'Skipping meta for {repo} - not in production.')
         else:
             logging.info(f'Skipping meta for {repo} - last fetched {round((now - fetched_at) / 60)} minutes ago.')
+
+    if stale:
+        gh = GitHub(token, args.jobs, args.api)
+        for repo, r in gh.get_repositories(stale).items():
+            data = meta[repo]
+            if r.status == 'failed':
+                continue
+            if r.status == 'not-modified':
+                logging.debug(f'Meta for {repo} not modified.')
+                if data.get('pushed_at'):
+                    pushed_at = datetime.fromtimestamp(data.get('pushed_at'))
+                    data['active'] = pushed_at > (datetime.now() - timedelta(days=30*6))
+            else:
+                data.update(r)
+            if r.etag:
+                etags[repo] = r.etag
+            data.update({ 'fetched_at': datetime.now().timestamp() })
     dump_dict(meta_out, meta)
+    dump_dict(etags_out, etags)
     logging.info(f'Processed {len(meta)} repositories.')
 
 def parse_args() -> argparse.Namespace:
@@ -71,6 +101,9 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument('--meta', type=str,
                         default='meta.json',
                         help='meta dict')
+    parser.add_argument('--etags', type=str,
+                        default='etags.json',
+                        help='ETags of the last repository responses')
     parser.add_argument('--input', type=str,
                         default='https://redis-stack.io/',
                         help='path to input dicts')
@@ -80,6 +113,12 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument('--expire', type=int,
                         default=24,
                         help='expire time in hours after last fetched_at')
+    parser.add_argument('--jobs', type=int,
+                        default=8,
+                        help='number of concurrent GitHub API requests')
+    parser.add_argument('--api', type=str,
+                        default=GitHub.API,
+                        help='GitHub API base URL')
     parser.add_argument('--production', action='store_true',
                         help='activates metadata fetching')
     parser.add_argument('--loglevel', type=str,
@@ -99,4 +138,4 @@ if __name__ == '__main__':
     start = datetime.now()
     get_repositories(ARGS)
     total = datetime.now() - start
-    print(f'+OK ({total.microseconds / 1000} ms)')
+    print(f'+OK ({round(total.total_seconds() * 1000)} ms)')
@@ -5,6 +5,7 @@ import sys
 import tempfile
 
 from stack.component import Stack
+from stack.profiler import PROFILER
 from stack.util import mkdir_p
 
 
@@ -20,9 +21,27 @@ def parse_args() -> argparse.Namespace:
                         help='Python logging level (overwrites LOGLEVEL env var)')
     parser.add_argument('--tempdir', type=str,
                         help='temporary path', default=f'{tempfile.gettempdir()}')
+    parser.add_argument('--cachedir', type=str,
+                        help='persistent git mirrors path (defaults to TEMPDIR/git-mirrors)')
     parser.add_argument('--module', type=str,
                         default='*',
                         help='builds a single module (implies core docs and assets)')
+    parser.add_argument('--manifest', type=str,
+                        default='./tmp/build-manifest.json',
+                        help='path to the incremental build manifest')
+    parser.add_argument('--diagrams', type=str,
+                        default='./tmp/diagram-cache.json',
+                        help='path to the rendered syntax diagrams cache')
+    parser.add_argument('--examples-cache', type=str,
+                        default='./tmp/example-cache.json',
+                        help='path to the processed examples cache')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuilds every page, ignoring the build manifest')
+    parser.add_argument('--jobs', type=int,
+                        default=1,
+                        help='number of components fetched concurrently')
+    parser.add_argument('--profile', type=str,
+                        help='writes a Chrome trace of the build phases and I/O counters to this path')
     return parser.parse_args()
 
 
@@ -41,4 +60,7 @@ if __name__ == '__main__':
     start = datetime.now()
     STACK.apply()
     total = datetime.now() - start
-    print(f'+OK ({total.microseconds / 1000} ms)')
+    if ARGS.profile:
+        PROFILER.persist(ARGS.profile)
+        logging.info(f'Build profile: {ARGS.profile} {PROFILER.counters}')
+    print(f'+OK ({round(total.total_seconds() * 1000)} ms)')
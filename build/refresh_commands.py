@@ -1,5 +1,5 @@
-from cmath import exp
-from stack.syntax import Command
+import os
+from stack.syntax import DiagramCache
 from stack.markdown import Markdown
 import json
 
@@ -7,21 +7,23 @@ if __name__ == '__main__':
     with open('data/commands.json', 'r') as f:
         j = json.load(f)
 
+    diagrams = DiagramCache('tmp/diagram-cache.json', os.cpu_count())
+    diagrams.render(j)
     board = []
     for k in j:
-        v = j.get(k)
-        c = Command(k, v)
-        sf = c.syntax()
-        d = c.diagram()
+        r = diagrams.rendered(k)
+        sf = r.get('syntax_fmt')
+        d = r.get('diagram')
         path = f'content/en/commands/{k.lower().replace(" ", "-")}/'
         md = Markdown(f'{path}index.md')
         md.fm_data.update({
-            'syntax_str': str(c),
+            'syntax_str': r.get('syntax_str'),
             'syntax_fmt': sf,
         })
         md.persist()
         with open(f'{path}syntax.svg', 'w+') as f:
             f.write(d)
+    diagrams.persist()
     #     board.append(sf)
     # board.sort(key=lambda x: len(x))
     # for c in board:
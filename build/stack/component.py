@@ -1,16 +1,22 @@
 import logging
 import glob
 import os
+import re
 import semver
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple
 from urllib.parse import urlparse, ParseResult
 
-from .markdown import Markdown
+from .documents import Documents
+from .manifest import Manifest
 from .structured_data import load_dict, dump_dict
-from .syntax import Command
-from .util import die, mkdir_p, rsync, regex_in_file, run, rm_rf, command_filename, slugify
-from .example import Example
+from .markdown import CommandIndex
+from .profiler import PROFILER
+from .syntax import DiagramCache
+from .util import die, find, mkdir_p, sync, regex_in_file, run, rm_rf, command_filename, slugify
+from .example import ExampleCache
 
 def parseUri(uri: str) -> Tuple[ParseResult, str, str]:
     _uri = urlparse(uri)
@@ -35,9 +41,22 @@ class Component(dict):
         self._desc = self.get('description', '')
         self._stack_path = self.get('stack_path', '')
         self._repository = self.get('repository', None)
-
-    @staticmethod
-    def _dump_payload(spath: str, dpath: str, payload: list, repo: str = None, repo_branch: str = None) -> None:
+        self._cmds = None
+
+    def _git_repos(self) -> list:
+        """ Returns the repository definitions this component checks out """
+        repos = []
+        for key in ['commands', 'docs', 'misc', 'data', 'repository', 'examples']:
+            repo = self.get(key)
+            if type(repo) is dict and repo.get('git_uri') and repo.get('dev_branch'):
+                repos.append(repo)
+        return repos
+
+    def _clone_lock(self, git_uri: str) -> threading.Lock:
+        with self._root._lock:
+            return self._root._clone_locks.setdefault(git_uri, threading.Lock())
+
+    def _dump_payload(self, spath: str, dpath: str, payload: list, repo: str = None, repo_branch: str = None) -> None:
         if not payload:
             return []
         files = []
@@ -51,20 +70,28 @@ class Component(dict):
                 mkdir_p(os.path.dirname(d))
             else:
                 mkdir_p(d)
-            files += rsync(s, d)
+            with PROFILER.phase(f'{self._id} copy', 'copy', src=src):
+                files += sync(s, d)
 
             if proc_md:
-                Component._add_meta_fm(repo, repo_branch, d, src)
+                with PROFILER.phase(f'{self._id} _add_meta_fm', '_add_meta_fm', path=src):
+                    self._add_meta_fm(repo, repo_branch, d, src)
 
             search = dump.get('search', None)
             replace = dump.get('replace', None)
             if search:
                 if os.path.isdir(s):
-                    files = next(os.walk(d), (None, None, []))[2]
+                    files = [os.path.join(d, f) for f in next(os.walk(d), (None, None, []))[2]]
                 else:
                     files = [d]
                 for file in files:
-                    regex_in_file(file, search, replace)
+                    if file.endswith('.md'):
+                        # Edited in the store, so the front matter added above isn't lost
+                        md = self._root._documents.load(file)
+                        md.payload = re.sub(search, replace, md.payload)
+                        self._root._documents.touch(md)
+                    else:
+                        regex_in_file(file, search, replace)
 
     @staticmethod
     def _get_dev_branch(repository: dict) -> str:
@@ -72,43 +99,101 @@ class Component(dict):
         post = repository .get("branches_postfix", "")
         return f'{branch}{post}'
 
-    @staticmethod
-    def _add_meta_fm(repo: str, branch: str, base: str, path: str) -> None:
+    def _add_meta_fm(self, repo: str, branch: str, base: str, path: str) -> None:
         _, dirs, files = next(os.walk(base))
         for d in dirs:
             spath = path.split('/')[-1]
             if spath == d:
-                Component._add_meta_fm(repo, branch, os.path.join(base, d), path)
+                self._add_meta_fm(repo, branch, os.path.join(base, d), path)
             else:
-                Component._add_meta_fm(repo, branch, os.path.join(base, d), os.path.join(path, d))
+                self._add_meta_fm(repo, branch, os.path.join(base, d), os.path.join(path, d))
         for f in files:
             if not f.endswith('.md'):
                 continue
-            md = Markdown(os.path.join(base, f))
+            if self._root._manifest.is_clean(os.path.join(base, f)):
+                continue
+            md = self._root._documents.load(os.path.join(base, f))
             md.add_github_metadata(repo, branch, os.path.join(path, f))
-            md.persist()
+            self._root._documents.touch(md)
+
+    @staticmethod
+    def _git_path(git_uri: str) -> str:
+        """ Returns the host and path of a repository without its `.git` suffix """
+        uri, _, name, ext = parseUri(git_uri)
+        if ext == '.git':
+            name = name[:-len(ext)]
+        return f'{uri.netloc}{os.path.dirname(uri.path)}/{name}'
+
+    def _git_mirror(self, git_uri: str, url: str, branch: str) -> str:
+        """ Fetches a branch into a persistent, blobless bare mirror of the repository """
+        mirror = f'{self._root._cachedir}/{Component._git_path(git_uri)}.git'
+        if not os.path.isfile(f'{mirror}/HEAD'):
+            rm_rf(mirror)
+            mkdir_p(mirror)
+            run(f'git init --bare --quiet', cwd=mirror)
+            run(f'git remote add origin {url}', cwd=mirror)
+            run(f'git config remote.origin.promisor true', cwd=mirror)
+            run(f'git config remote.origin.partialclonefilter blob:none', cwd=mirror)
+        else:
+            run(f'git remote set-url origin {url}', cwd=mirror)
+        src = f'refs/heads/{branch}' if branch else 'HEAD'
+        run(f'git fetch --quiet --filter=blob:none --no-tags origin +{src}:{self._git_ref(branch)}', cwd=mirror)
+        return mirror
+
+    @staticmethod
+    def _git_ref(branch: str) -> str:
+        return f'refs/remotes/origin/{branch or "HEAD"}'
+
+    @staticmethod
+    def _git_worktree(mirror: str, branch: str, to: str) -> None:
+        """ Materializes (or fast-forwards) a detached worktree of the mirror """
+        ref = Component._git_ref(branch)
+        if os.path.isfile(f'{to}/.git'):
+            # A worktree of another (or an evicted) mirror is stale and can't be reused
+            with open(f'{to}/.git', 'r') as f:
+                gitdir = f.read().strip().split('gitdir: ', 1)[-1]
+            common = os.path.isdir(gitdir) and run(f'git rev-parse --git-common-dir', cwd=to, _try=True)
+            if not common or os.path.realpath(os.path.join(to, common.strip())) != os.path.realpath(mirror):
+                logging.info(f'Recreating {to} - it is not a worktree of {mirror}')
+                rm_rf(to)
+        if os.path.isfile(f'{to}/.git'):
+            run(f'git checkout --quiet --force --detach {ref}', cwd=to)
+            run(f'git clean --quiet -ffdx', cwd=to)
+        else:
+            rm_rf(to)
+            mkdir_p(os.path.dirname(to))
+            run(f'git worktree prune', cwd=mirror)
+            run(f'git worktree add --quiet --force --detach {to} {ref}', cwd=mirror)
 
     def _git_clone(self, repo) -> str:
         git_uri = repo.get('git_uri')
         private = repo.get('private', False)
         uri, _, name, ext = parseUri(git_uri)
-        to = f'{self._root._tempdir}/{name}'
-        if uri.scheme == 'https' and ext in ['', '.git'] and self._repo_uri() != git_uri:
-            if not self._root._skip_clone and git_uri not in self._root._clones:
-                rm_rf(to)
-                mkdir_p(to)
-                logging.debug(
-                    f'Cloning {private and "private" or "public"} {git_uri} to {to}')
-                self._root._clones[git_uri] = True
-                if private:
-                    pat = os.environ.get('PRIVATE_ACCESS_TOKEN')
-                    if pat is None:
-                        die('Private repos without a PRIVATE_ACCESS_TOKEN - aborting.')
-                    git_uri = f'{uri.scheme}://{pat}@{uri.netloc}{uri.path}'
-                run(f'git clone {git_uri} {to}')
-                run(f'git fetch --all --tags', cwd=to)
-            else:
-                logging.debug(f'Skipping clone {git_uri}')
+        branch = Component._get_dev_branch(repo) if repo.get('dev_branch') else None
+        to = f'{self._root._tempdir}/{Component._git_path(git_uri)}'
+        if branch:
+            to += f'@{slugify(branch)}'
+        mirrored = (uri.scheme == 'https' and ext in ['', '.git']) or (uri.scheme == 'file' and ext == '.git')
+        if mirrored and self._repo_uri() != git_uri:
+            # Concurrent callers of the same repo wait for the first fetch to finish
+            with self._clone_lock(git_uri):
+                if not self._root._skip_clone and (git_uri, branch) not in self._root._clones:
+                    logging.debug(
+                        f'Fetching {private and "private" or "public"} {git_uri} {branch or "HEAD"} to {to}')
+                    url = git_uri
+                    if private:
+                        pat = os.environ.get('PRIVATE_ACCESS_TOKEN')
+                        if pat is None:
+                            die('Private repos without a PRIVATE_ACCESS_TOKEN - aborting.')
+                        url = f'{uri.scheme}://{pat}@{uri.netloc}{uri.path}'
+                    with PROFILER.phase(f'{self._id} clone', 'clone', git_uri=git_uri, branch=branch):
+                        mirror = self._git_mirror(git_uri, url, branch)
+                        Component._git_worktree(mirror, branch, to)
+                    self._root._clones[(git_uri, branch)] = to
+                else:
+                    logging.debug(f'Skipping clone {git_uri}')
+                    if os.path.isfile(f'{to}/.git'):
+                        self._root._clones.setdefault((git_uri, branch), to)
             return to
         elif self._repo_uri() == git_uri:
             return self._repo_env_dir()
@@ -117,44 +202,65 @@ class Component(dict):
         else:
             die('Cannot determine git repo - aborting.')
 
-    def _get_commands(self) -> list:
+    def _read_commands(self) -> dict:
         commands = self.get('commands')
+        if commands is None:
+            return {}
+        if self._cmds is not None:
+            return self._cmds
+
         repo = self._git_clone(commands)
         branch = Component._get_dev_branch(commands)
         self._checkout(branch, repo, commands)
-        path = commands.get('path', '')
-
-        logging.info(f'Copying {self._id} commands')
         filename = commands.get('defs', 'commands.json')
         filepath = f'{repo}/{filename}'
         logging.info(
             f'Reading {self._id} {self._type} commands.json from {branch}/{filename}')
         cmds = load_dict(filepath)
+        if self._type == 'module':
+            for key in cmds:
+                cmds[key]['module'] = self._name
+                cmds[key]['stack_path'] = self._stack_path
+        self._cmds = cmds
+        return cmds
+
+    def _get_commands(self) -> list:
+        commands = self.get('commands')
+        cmds = self._read_commands()
+        repo = self._git_clone(commands)
+        branch = Component._get_dev_branch(commands)
+        path = commands.get('path', '')
 
+        logging.info(f'Copying {self._id} commands')
         sinter = set(cmds).intersection(set(self._root._commands))
         if len(sinter) != 0:
             logging.error(f'Duplicate command(s) found in {self._id}:')
             logging.error(sinter)
             die()
-
-        if self._type == 'module':
-            for key in cmds:
-                cmds[key]['module'] = self._name
-                cmds[key]['stack_path'] = self._stack_path
         self._root._commands.update(cmds)
 
         base = f'{repo}/{path}/'
         dst = f'{self._root._website.get("content")}/commands/'
-        srcs = [f'{base}{command_filename(cmd)}.md' for cmd in cmds]
-        files = rsync(' '.join(srcs), dst)[1:-5]
+        manifest = self._root._manifest
+        srcs = []
+        for cmd in cmds:
+            src = f'{base}{command_filename(cmd)}.md'
+            key = manifest.key(src, cmds.get(cmd))
+            index = f'{dst}/{command_filename(cmd)}/index.md'
+            if not manifest.check(index, key):
+                srcs.append(src)
+        logging.info(f'Skipping {len(cmds) - len(srcs)} unchanged {self._id} commands')
+        with PROFILER.phase(f'{self._id} copy', 'copy', src=base, files=len(srcs)):
+            files = sync(srcs, dst)
         self._dump_payload(base, dst, cmds.get('payload', None))
-        self._add_meta_fm(commands.get('git_uri'), branch, dst, path)
+        with PROFILER.phase(f'{self._id} _add_meta_fm', '_add_meta_fm', path=path):
+            self._add_meta_fm(commands.get('git_uri'), branch, dst, path)
         if self._type == 'module':
             for file in files:
                 path = f'{dst}/{file}'
-                md = Markdown(path)
+                md = self._root._documents.load(path)
                 md.patch_module_paths(self._id, self._stack_path)
-                md.persist()
+                self._root._documents.touch(md)
         return files
 
     def _get_groups(self) -> None:
@@ -190,9 +296,21 @@ class Component(dict):
         src = f'{repo}/{path}/'
         dst = f'{self._content}'
         mkdir_p(dst)
-        files = rsync(src, dst)[1:-5]
-        Component._dump_payload(src, dst, docs.get('payload', None))
-        Component._add_meta_fm(docs.get('git_uri'), branch, dst, path)
+        manifest = self._root._manifest
+        skip = []
+        for root, _, filenames in os.walk(src):
+            for filename in filenames:
+                if not filename.endswith('.md'):
+                    continue
+                rel = os.path.relpath(os.path.join(root, filename), src)
+                if manifest.check(os.path.join(dst, rel), manifest.key(os.path.join(src, rel))):
+                    skip.append(rel)
+        logging.info(f'Skipping {len(skip)} unchanged {self._id} docs')
+        with PROFILER.phase(f'{self._id} copy', 'copy', src=src, skipped=len(skip)):
+            files = sync(src, dst, skip=skip)
+        self._dump_payload(src, dst, docs.get('payload', None))
+        with PROFILER.phase(f'{self._id} _add_meta_fm', '_add_meta_fm', path=path):
+            self._add_meta_fm(docs.get('git_uri'), branch, dst, path)
         return files
 
     def _get_misc(self) -> None:
@@ -201,7 +319,7 @@ class Component(dict):
         repo = self._git_clone(misc)
         branch = Component._get_dev_branch(misc)
         self._checkout(branch, repo, misc)
-        Component._dump_payload(repo, self._root._content, payload, misc.get('git_uri'), branch)
+        self._dump_payload(repo, self._root._content, payload, misc.get('git_uri'), branch)
         return
     
     def _repo_env_dir(self) -> str:
@@ -225,8 +343,12 @@ class Component(dict):
         return False
     
     def _checkout(self, ref, dest, obj):
+        if dest in self._root._clones.values():
+            # Worktrees are already materialized at their branch by `_git_clone`
+            return
         if not self._skip_checkout(obj):
-            run(f'git checkout {ref}', cwd=dest)
+            with PROFILER.phase(f'{self._id} checkout', 'checkout', ref=ref):
+                run(f'git checkout {ref}', cwd=dest)
 
 class Stack(Component):
     def __init__(self, filepath: str, root: dict = None, args: dict = None):
@@ -237,10 +359,18 @@ class Stack(Component):
         self._clones = {}
         self._repos = {}
         self._tempdir = args.get('tempdir')
+        self._cachedir = args.get('cachedir') or f'{self._tempdir}/git-mirrors'
         self._website = self.get('website')
         self._skip_clone = self.get('skip_clone')
         self._content = f'{self._website.get("path")}/{self._website.get("content")}'
         self._examples = {}
+        self._manifest = Manifest(args.get('manifest'), args.get('force'))
+        self._documents = Documents()
+        self._jobs = max(1, args.get('jobs') or 1)
+        self._diagrams = DiagramCache(args.get('diagrams'), self._jobs)
+        self._example_cache = ExampleCache(args.get('examples_cache'))
+        self._lock = threading.Lock()
+        self._clone_locks = {}
         mkdir_p(self._content)
 
     def _persist_commands(self) -> None:
@@ -283,10 +413,10 @@ class Stack(Component):
                 for pname, project in group.items():
                     filename = f'{path}/{slugify(gname)}_{slugify(pname)}.md'
                     # cheap hack to workaround two (or more) clients that resolve to the same filename
-                    if kname == 'clients' and os.path.isfile(filename):
+                    if kname == 'clients' and self._documents.exists(filename):
                         uu = uuid.uuid4().hex[0:7]
                         filename = f'{path}/{slugify(gname)}_{slugify(pname)}{uu}.md'
-                    md = Markdown(filename, True)
+                    md = self._documents.load(filename, True)
                     md.payload = ''
                     md.fm_data['recommended'] = False
                     md.fm_data['official'] = False
@@ -295,31 +425,37 @@ class Stack(Component):
                     md.fm_data.update({'group': gname})
                     md.fm_data.update({'kind': kname})
                     md.fm_data.update(meta.get(project.get('repository'), {}))
-                    md.persist()
+                    self._documents.touch(md)
         dump_dict(f'data/repos.json', self._repos)
 
     def _process_commands(self) -> None:
         logging.info(f'Processing {self._id} commands')
+        self._diagrams.render(self._commands)
         for name in self._commands:
             path = f'{self._content}/commands/{command_filename(name)}'
+            if self._manifest.is_clean(f'{path}/index.md'):
+                continue
             mkdir_p(path)
-            run(f'mv {path}.md {path}/index.md')
-            md = Markdown(f'{path}/index.md')
-            md.process_command(name, self._commands)
-            c = Command(name, self._commands.get(name))
-            d = c.diagram()
+            self._documents.move(f'{path}.md', f'{path}/index.md')
+            md = self._documents.load(f'{path}/index.md')
+            rendered = self._diagrams.rendered(name)
+            md.process_command(name, self._commands, self._index, rendered)
+            self._documents.touch(md)
             with open(f'{path}/syntax.svg', 'w+') as f:
-                f.write(d)
+                f.write(rendered.get('diagram'))
+        self._diagrams.persist()
 
     def _process_docs(self) -> None:
         logging.info(f'Processing {self._id} docs')
-        out = run(
-            f'find {self._content} -type f -name "*.md" | grep -ive "{self._content}/commands"').strip().split('\n')
-        for md_path in out:
-            md = Markdown(md_path, True)
-            md.process_doc(self._commands)
+        for md_path in find(self._content, '.md', f'{self._content}/commands'):
+            if self._manifest.is_clean(md_path):
+                continue
+            md = self._documents.load(md_path, True)
+            md.process_doc(self._commands, self._index)
+            self._documents.touch(md)
 
-    def apply(self) -> None:
+    def _get_components(self) -> list:
+        components = []
         for kind in ['clients','core', 'docs', 'modules',  'assets']:
             for component in self.get(kind):
                 if type(component) == str:
@@ -342,14 +478,93 @@ class Stack(Component):
                         c = Asset(filename, self)
                 else:
                     die(f'Unknown component definition for {component}')
-                c.apply()
+                components.append(c)
+        return components
+
+    def _prefetch(self, components: list, pool: ThreadPoolExecutor) -> None:
+        """ Clones every repository used by the components, one job per repository """
+        repos = {}
+        for c in components:
+            for repo in c._git_repos():
+                key = (repo.get('git_uri'), Component._get_dev_branch(repo))
+                repos.setdefault(key, (c, repo))
+        logging.info(f'Prefetching {len(repos)} {self._id} repositories with {self._jobs} jobs')
+        for future in [pool.submit(c._git_clone, repo) for c, repo in repos.values()]:
+            future.result()
+
+    @staticmethod
+    def _make_lanes(components: list) -> list:
+        """ Groups components that share a repository so they are applied one after another """
+        lanes = []
+        for c in components:
+            uris = set(repo.get('git_uri') for repo in c._git_repos())
+            lane = ([], uris)
+            for other in [l for l in lanes if l[1] & uris]:
+                lanes.remove(other)
+                lane = (lane[0] + other[0], lane[1] | other[1])
+            lane[0].append(c)
+            lanes.append(lane)
+        return [l[0] for l in lanes]
+
+    def _get_settings(self, components: list) -> dict:
+        """ Returns the build-wide inputs of every page besides its own source """
+        code = sorted(glob.glob(f'{os.path.dirname(__file__)}/*.py'))
+        names = set()
+        for c in components:
+            names.update(c._read_commands())
+        return {
+            'stack': self,
+            'components': components,
+            'module': self._args.get('module'),
+            'code': [Manifest.file_digest(f) for f in code],
+            'commands': sorted(names),
+        }
+
+    @staticmethod
+    def _apply(component) -> None:
+        with PROFILER.phase(f'{component._id} apply', 'apply'):
+            component.apply()
+
+    def _merge_examples(self, component) -> None:
+        for example_id, langs in component._examples.items():
+            self._examples.setdefault(example_id, {}).update(langs)
+
+    def apply(self) -> None:
+        components = self._get_components()
+        clients = [c for c in components if type(c) is Client]
+        with ThreadPoolExecutor(max_workers=self._jobs) as pool:
+            if self._jobs > 1:
+                self._prefetch(components, pool)
+            self._manifest.set_settings(self._get_settings(components))
+            if self._jobs > 1:
+                # Clients only write their own examples, so they are applied concurrently.
+                # The rest copy into nested content paths and share the root's commands,
+                # hence are applied in order once their repositories are fetched.
+                futures = [pool.submit(lambda l: [Stack._apply(c) for c in l], lane)
+                           for lane in self._make_lanes(clients)]
+                for future in futures:
+                    future.result()
+        for c in components:
+            if type(c) is not Client or self._jobs == 1:
+                Stack._apply(c)
+            if type(c) is Client:
+                self._merge_examples(c)
         self._persist_commands()
         self._persist_groups()
         self._persist_examples()
+        self._example_cache.persist()
         self._persist_versions()
-        self._process_commands()
-        self._process_docs()
-        self._make_repos()
+        self._index = CommandIndex(self._commands)
+        with PROFILER.phase('_process_commands'):
+            self._process_commands()
+        with PROFILER.phase('_process_docs'):
+            self._process_docs()
+        with PROFILER.phase('_make_repos'):
+            self._make_repos()
+        with PROFILER.phase('flush'):
+            # Pages skipped by the manifest may have been touched before they were checked
+            self._documents.flush(self._manifest.is_clean)
+        self._manifest.persist()
 
 
 class Core(Component):
@@ -393,7 +608,8 @@ class Core(Component):
         for src in ['languages', 'tool_types', 'resp2_replies', 'resp3_replies']:
             filename = data.get(src)
             filepath = f'{repo}/{filename}'
-            rsync(filepath, 'data/')
+            with PROFILER.phase(f'{self._id} copy', 'copy', src=filename):
+                sync(filepath, 'data/')
         for src in ['clients', 'libraries', 'modules', 'tools']:
             data = self._make_data(f'{repo}/{src}')
             self._root._repos[src] = data
@@ -407,11 +623,13 @@ class Core(Component):
         src = f'{repo}/redis.conf'
         dst = f'{self._content}/{self.get("config_file_template")}'
         logging.info(f'Embedding {self._id} redis.conf into {dst}')
-        md = Markdown(dst)
+        self._root._manifest.invalidate(dst)
+        md = self._root._documents.load(dst)
         with open(src, 'r') as f:
+            PROFILER.count('bytes_read', os.fstat(f.fileno()).st_size)
             md.payload = f.read()
         md.payload = f'\n```\n{md.payload}\n```\n'
-        md.persist()
+        self._root._documents.touch(md)
 
     def apply(self) -> None:
         logging.info(f'Applying core {self._id}')
@@ -458,21 +676,25 @@ class Module(Component):
                     f'both index.md and _index.md exist in {self._content} - please address this immediately!!!')
 
             stack_weight = self.get('stack_weight')
+            manifest = self._root._manifest
+            documents = self._root._documents
             for f in foes:
-                md = Markdown(f)
+                if manifest.is_clean(f):
+                    continue
+                md = documents.load(f)
                 md.fm_data['weight'] = stack_weight
-                md.persist()
+                documents.touch(md)
 
-            files = run(
-                f'find {self._content} -regex ".*\.md"').strip().split('\n')
-            for f in files:
-                md = Markdown(f)
+            for f in find(self._content, '.md'):
+                if manifest.is_clean(f):
+                    continue
+                md = documents.load(f)
                 t = md.fm_data.pop('type', None)
                 if t:
                     logging.warning(
                         f'the file {f} has a type set to `{t}` - please prevent future harm by acting now, thank you.')
                 md.patch_module_paths(self._id, self._stack_path)
-                md.persist()
+                documents.touch(md)
 
     def apply(self) -> None:
         logging.info(f'Applying module {self._id}')
@@ -486,15 +708,7 @@ class Client(Component):
     def __init__(self, filepath: str, root: dict = None):
         print(str("file_path = {}".format(filepath)))
         super().__init__(filepath, root)
-
-    def _get_example_id_from_file(self, path):
-        with open(path) as cf:
-            fline = cf.readline()
-
-        if 'EXAMPLE:' in fline:
-            return fline.split(':')[1].strip()
-
-        return None
+        self._examples = {}
 
     def _copy_examples(self):
         if ex := self.get('examples'):
@@ -508,32 +722,41 @@ class Client(Component):
 
             logging.info(f'Copying {self._id} examples to {dst}')
 
-            for f in glob.glob(os.path.join(src, ex.get('pattern')), recursive=True):
-                example_id = self._get_example_id_from_file(f)
-
+            files = glob.glob(os.path.join(src, ex.get('pattern')), recursive=True)
+            with PROFILER.phase(f'{self._id} copy', 'copy', src=src, files=len(files)), \
+                    ThreadPoolExecutor(max_workers=self._root._jobs) as pool:
+                results = list(pool.map(lambda f: self._copy_example(ex, f, dst), files))
+            for example_id, example_metadata in results:
                 if not example_id:
                     continue
-
-                example_metadata = {'source': f}
-
-                mkdir_p(f'{dst}/{example_id}')
-                rsync(example_metadata['source'], f'{dst}/{example_id}/')
-
-                example_metadata['target'] = f'{dst}/{example_id}/{os.path.basename(f)}'
-                e = Example(self.get('language'), example_metadata['target'])
-                example_metadata['highlight'] = e.highlight
-                example_metadata['hidden'] = e.hidden
-                example_metadata['named_steps'] = e.named_steps
-                example_metadata['sourceUrl'] = (
-                    f'{ex["git_uri"]}/tree/{ex["dev_branch"]}/{ex["path"]}/{os.path.basename(f)}'
-                )
-                examples = self._root._examples
+                examples = self._examples
                 if example_id not in examples:
                     examples[example_id] = {}
 
                 logging.info(f'Example {example_id} processed successfully.')
                 examples[example_id][self.get('language')] = example_metadata
 
+    def _copy_example(self, ex: dict, f: str, dst: str) -> tuple:
+        with open(f) as cf:
+            PROFILER.count('bytes_read', os.fstat(cf.fileno()).st_size)
+            text = cf.read()
+        fline = text.split('\n', 1)[0]
+        if 'EXAMPLE:' not in fline:
+            return None, None
+        example_id = fline.split(':')[1].strip()
+
+        example_metadata = {'source': f}
+        mkdir_p(f'{dst}/{example_id}')
+        example_metadata['target'] = f'{dst}/{example_id}/{os.path.basename(f)}'
+        e = self._root._example_cache.process(self.get('language'), text, example_metadata['target'])
+        example_metadata['highlight'] = e.get('highlight')
+        example_metadata['hidden'] = e.get('hidden')
+        example_metadata['named_steps'] = e.get('named_steps')
+        example_metadata['sourceUrl'] = (
+            f'{ex["git_uri"]}/tree/{ex["dev_branch"]}/{ex["path"]}/{os.path.basename(f)}'
+        )
+        return example_id, example_metadata
+
     def apply(self) -> None:
         logging.info(f'Applying client {self._id}')
         self._copy_examples()
@@ -547,4 +770,4 @@ class Asset(Component):
         repo = self._git_clone(self._repository)
         dev_branch = self._repository.get('dev_branch')
         self._checkout(dev_branch, repo, self._repository)        #
-        return Component._dump_payload(repo, './', self._repository.get('payload'))
+        return self._dump_payload(repo, './', self._repository.get('payload'))
@@ -0,0 +1,76 @@
+import logging
+import os
+from .markdown import Markdown
+
+
+class Documents(dict):
+    """
+    In-memory store of the Markdown documents being built, keyed by path. Each document
+    is read once, transformed in place by the build steps and written once by `flush()`.
+    A document whose file is replaced on disk (e.g. by a later copy) is reloaded, so the
+    newest copy wins just like it would with immediate writes.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._stats = {}
+        self._dirty = set()
+
+    @staticmethod
+    def _stat(path: str) -> tuple:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def load(self, path: str, warnings: bool = False) -> Markdown:
+        key = os.path.normpath(path)
+        stat = Documents._stat(key)
+        md = self.get(key)
+        if md is None or self._stats.get(key) != stat:
+            md = Markdown(path, warnings)
+            self[key] = md
+            self._stats[key] = stat
+            self._dirty.discard(key)
+        md.warnings = md.warnings or warnings
+        return md
+
+    def exists(self, path: str) -> bool:
+        return os.path.normpath(path) in self or os.path.isfile(path)
+
+    def touch(self, md: Markdown) -> None:
+        """ Marks a document as changed """
+        self._dirty.add(os.path.normpath(md.filepath))
+
+    def move(self, src: str, dst: str) -> None:
+        skey, dkey = os.path.normpath(src), os.path.normpath(dst)
+        os.replace(src, dst)
+        self.pop(dkey, None)
+        self._dirty.discard(dkey)
+        md = self.pop(skey, None)
+        if md is not None:
+            md.filepath = dst
+            self[dkey] = md
+            self._stats[dkey] = Documents._stat(dkey)
+            if skey in self._dirty:
+                self._dirty.add(dkey)
+        self._stats.pop(skey, None)
+        self._dirty.discard(skey)
+
+    def flush(self, skip=None) -> None:
+        """ Writes the changed documents, except those for which `skip(path)` is true """
+        written = 0
+        for key in sorted(self._dirty):
+            if self._stats.get(key) != Documents._stat(key):
+                logging.debug(f'{key} was replaced on disk - dropping in-memory changes')
+                continue
+            if skip and skip(key):
+                logging.debug(f'{key} is unchanged since the last build - dropping in-memory changes')
+                continue
+            self[key].persist()
+            written += 1
+        logging.info(f'Wrote {written} of {len(self)} documents')
+        self.clear()
+        self._stats = {}
+        self._dirty = set()
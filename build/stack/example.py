@@ -1,5 +1,13 @@
+import hashlib
+import io
 import logging
+import os
 import re
+from functools import lru_cache
+from .manifest import Manifest
+from .profiler import PROFILER
+from .structured_data import load_dict, dump_dict
+from .util import mkdir_p
 
 HIDE_START = 'HIDE_START'
 HIDE_END = 'HIDE_END'
@@ -21,6 +29,19 @@ PREFIXES = {
     'c#': '//',
 }
 
+# Markers in the order they take precedence when a line has more than one
+MARKERS = [HIDE_START, HIDE_END, REMOVE_START, REMOVE_END, STEP_START, STEP_END, EXAMPLE]
+
+
+@lru_cache(maxsize=None)
+def get_scanner(language: str) -> tuple:
+    """ Returns the language's comment prefix, its markers pattern and its test marker pattern """
+    markers = MARKERS + ([GO_OUTPUT] if language == 'go' else [])
+    scanner = re.compile(f'{PREFIXES[language]}\\s?({"|".join(markers)})')
+    test_marker = TEST_MARKER.get(language)
+    return PREFIXES[language], scanner, test_marker and re.compile(test_marker)
+
+
 class Example(object):
     language = None
     path = None
@@ -29,19 +50,23 @@ class Example(object):
     highlight = None
     named_steps = None
 
-    def __init__(self, language: str, path: str) -> None:
+    def __init__(self, language: str, path: str, content: list = None) -> None:
         if not PREFIXES.get(language.lower()):
             logging.error(f'Unknown language "{language}" for example {path}')
             return
         self.language = language.lower()
         self.path = path
-        with open(path, 'r') as f:
-            self.content = f.readlines()
+        if content is None:
+            with open(path, 'r') as f:
+                self.content = f.readlines()
+        else:
+            self.content = content
         self.hidden = []
         self.highlight = []
         self.named_steps = {}
         self.make_ranges()
-        self.persist(self.path)
+        if content is None:
+            self.persist(self.path)
 
     def persist(self, path: str = None) -> None:
         if not path:
@@ -58,21 +83,17 @@ class Example(object):
         step_start = None
         step_name = None
         content = []
-        hstart = re.compile(f'{PREFIXES[self.language]}\\s?{HIDE_START}')
-        hend = re.compile(f'{PREFIXES[self.language]}\\s?{HIDE_END}')
-        sstart = re.compile(f'{PREFIXES[self.language]}\\s?{STEP_START}')
-        send = re.compile(f'{PREFIXES[self.language]}\\s?{STEP_END}')
-        rstart = re.compile(f'{PREFIXES[self.language]}\\s?{REMOVE_START}')
-        rend = re.compile(f'{PREFIXES[self.language]}\\s?{REMOVE_END}')
-        exid = re.compile(f'{PREFIXES[self.language]}\\s?{EXAMPLE}')
-        go_output = re.compile(f'{PREFIXES[self.language]}\\s?{GO_OUTPUT}')
-        go_comment = re.compile(f'{PREFIXES[self.language]}')
-        test_marker = re.compile(f'{TEST_MARKER.get(self.language)}')
+        prefix, scanner, test_marker = get_scanner(self.language)
+        go = self.language == 'go'
 
         while curr < len(self.content):
             l = self.content[curr]
+            marker = None
+            if prefix in l:
+                found = scanner.findall(l)
+                marker = next((m for m in MARKERS + [GO_OUTPUT] if m in found), None)
 
-            if re.search(hstart, l):
+            if marker == HIDE_START:
                 if hidden is not None:
                     logging.error(f'Nested hidden anchor in {self.path}:L{curr+1} - aborting.')
                     return
@@ -80,7 +101,7 @@ class Example(object):
                     self.highlight.append(f'{highlight}-{len(content)}')
                 hidden = len(content)
                 output = False
-            elif re.search(hend, l):
+            elif marker == HIDE_END:
                 if hidden is None:
                     logging.error(f'Closing hidden anchor w/o a start in {self.path}:L{curr+1} - aborting.')
                     return
@@ -91,19 +112,19 @@ class Example(object):
                 highlight = len(content) + 1
                 hidden = None
                 output = False
-            elif re.search(rstart, l):
+            elif marker == REMOVE_START:
                 if remove:
                     logging.error(f'Nested remove anchor in {self.path}:L{curr+1} - aborting.')
                     return
                 remove = True
                 output = False
-            elif re.search(rend, l):
+            elif marker == REMOVE_END:
                 if not remove:
                     logging.error(f'Closing remove anchor w/o a start in {self.path}:L{curr+1} - aborting.')
                     return
                 remove = False
                 output = False
-            elif re.search(sstart, l):
+            elif marker == STEP_START:
                 if step_start:
                     logging.error(f'Nested step anchor in {self.path}:L{curr + 1} - aborting.')
                     return
@@ -112,7 +133,7 @@ class Example(object):
                     step_name = l.split(STEP_START)[1].strip()
                 except IndexError:
                     step_name = None
-            elif re.search(send, l):
+            elif marker == STEP_END:
                 if not step_start:
                     logging.error(f'Closing step anchor w/o a start in {self.path}:L{curr + 1} - aborting.')
                     return
@@ -124,17 +145,17 @@ class Example(object):
                 self.named_steps[step_name] = f'{step_start}-{len(content)}'
                 step_start = None
                 step_name = None
-            elif re.search(exid, l):
+            elif marker == EXAMPLE:
                 output = False
                 pass
-            elif self.language == "go" and re.search(go_output, l):
+            elif marker == GO_OUTPUT:
                 if output:
                     logging.error("Nested Go Output anchor in {self.path}:L{curr+1} - aborting.")
                     return
                 output = True
-            elif self.language == "go" and re.search(go_comment, l) and output:
+            elif go and output and prefix in l:
                 pass
-            elif self.language in TEST_MARKER.keys() and re.search(test_marker, l): # Removes "[Fact]" from CSharp files and "@Test" from Java files
+            elif test_marker and test_marker.search(l): # Removes "[Fact]" from CSharp files and "@Test" from Java files
                 pass
             else:
                 output = False
@@ -150,3 +171,50 @@ class Example(object):
             self.highlight.append(f'{highlight}-{len(content)}')
 
         self.content = content
+
+
+class ExampleCache(dict):
+    """
+    Example metadata and stripped content by a hash of the language and source, and
+    of the scanner's code, persisted between builds.
+    """
+
+    def __init__(self, filepath: str = None):
+        super().__init__()
+        self._filepath = filepath
+        self._used = set()
+        self._code = Manifest.file_digest(__file__)
+        if filepath and os.path.isfile(filepath):
+            self.update(load_dict(filepath))
+
+    def process(self, language: str, text: str, target: str) -> dict:
+        """ Writes the stripped example to `target` unless it's already there and returns its metadata """
+        key = hashlib.sha256(f'{self._code}:{language.lower()}:{text}'.encode('utf-8')).hexdigest()
+        entry = self.get(key)
+        if entry is None:
+            e = Example(language, target, io.StringIO(text).readlines())
+            entry = {
+                'content': ''.join(e.content) if e.content is not None else text,
+                'hidden': e.hidden,
+                'highlight': e.highlight,
+                'named_steps': e.named_steps,
+            }
+            self[key] = entry
+        self._used.add(key)
+
+        content = entry.get('content')
+        if os.path.isfile(target):
+            with open(target, 'r') as f:
+                PROFILER.count('bytes_read', os.fstat(f.fileno()).st_size)
+                if f.read() == content:
+                    return entry
+        with open(target, 'w') as f:
+            f.write(content)
+        PROFILER.count('bytes_written', os.path.getsize(target))
+        return entry
+
+    def persist(self) -> None:
+        if not self._filepath:
+            return
+        mkdir_p(os.path.dirname(self._filepath))
+        dump_dict(self._filepath, {key: self[key] for key in self._used})
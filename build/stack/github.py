@@ -1,25 +1,120 @@
 import logging
 import os
 import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse
 
 
+class GitHub:
+    """
+    A pooled GitHub REST API client that sends conditional requests and paces itself
+    by the rate limit headers of the responses.
+    """
+    API = 'https://api.github.com'
+
+    def __init__(self, gh_token=None, jobs: int = 8, api: str = API, timeout: float = 10,
+                 reserve: int = 50, retries: int = 3):
+        self.gh_token = gh_token
+        self.jobs = jobs
+        self.api = api.rstrip('/')
+        self.timeout = timeout
+        self.reserve = reserve
+        self.retries = retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=jobs)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Accept': 'application/vnd.github+json'})
+        if gh_token:
+            self.session.headers.update({'Authorization': f'token {gh_token}'})
+        self._lock = threading.Lock()
+        self._remaining = None
+        self._reset = None
+
+    def _update_limits(self, r: requests.Response) -> None:
+        remaining = r.headers.get('X-RateLimit-Remaining')
+        reset = r.headers.get('X-RateLimit-Reset')
+        if remaining is None or reset is None:
+            return
+        with self._lock:
+            self._remaining = int(remaining)
+            self._reset = float(reset)
+
+    def _throttle(self) -> None:
+        """ Waits for the reset when the quota is spent and spreads requests when it runs low """
+        with self._lock:
+            remaining, reset = self._remaining, self._reset
+        if remaining is None:
+            return
+        wait = max(0, reset - time.time())
+        if remaining <= self.reserve:
+            logging.warning(f'GitHub rate limit almost exhausted ({remaining} left) - waiting {round(wait)}s for reset.')
+            time.sleep(wait)
+        elif remaining < self.reserve * 4:
+            time.sleep(wait / remaining)
+
+    def get(self, path: str, etag: str = None) -> requests.Response:
+        """ GETs an API path, returns None if it keeps failing """
+        headers = {'If-None-Match': etag} if etag else {}
+        for attempt in range(self.retries + 1):
+            self._throttle()
+            try:
+                r = self.session.get(f'{self.api}{path}', headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                logging.warning(f'GET {path} failed: {e}')
+                time.sleep(2 ** attempt)
+                continue
+            self._update_limits(r)
+            if r.status_code in [403, 429] and (r.headers.get('Retry-After') or r.headers.get('X-RateLimit-Remaining') == '0'):
+                if r.headers.get('Retry-After'):
+                    wait = float(r.headers.get('Retry-After'))
+                elif self._reset is not None:
+                    wait = max(0, self._reset - time.time())
+                else:
+                    wait = 2 ** attempt
+                logging.warning(f'GET {path} rate limited - retrying in {round(wait)}s.')
+                time.sleep(wait)
+                continue
+            if r.status_code >= 500:
+                logging.warning(f'GET {path} failed with {r.status_code}')
+                time.sleep(2 ** attempt)
+                continue
+            return r
+        return None
+
+    def get_repositories(self, repos: dict) -> dict:
+        """ Concurrently gets the repositories given as {uri: etag} """
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            futures = {uri: pool.submit(Repository, uri, self.gh_token, self, etag) for uri, etag in repos.items()}
+            return {uri: future.result() for uri, future in futures.items()}
+
+
 class Repository(dict):
     _props = ['archived', 'description', 'forks_count', 'stargazers_count',
               'open_issues_count', ]
 
-    def __init__(self, uri, gh_token=None):
+    def __init__(self, uri, gh_token=None, gh: GitHub = None, etag: str = None):
         super().__init__()
         self.uri = urlparse(f'https://{uri}')
         self.gh_token = gh_token
+        self.etag = etag
+        self.status = 'skipped'
         self.owner, self.name = os.path.split(self.uri.path)
         self.owner = self.owner[1:]
         for prop in self._props:
             self[prop] = None
-        self._get_gh_stats()
+        try:
+            self._get_gh_stats(gh or GitHub(gh_token, 1))
+        except Exception as e:
+            # One bad response shouldn't abort a whole concurrent batch
+            logging.warning(f'Could not get stats for {self.owner}/{self.name} ({e}).')
+            self.status = 'failed'
 
-    def _get_gh_stats(self) -> None:
+    def _get_gh_stats(self, gh: GitHub) -> None:
         if self.uri.netloc != 'github.com':
             logging.warning(
                 f'Unknown repository provider {self.uri.netloc} - skipping stats.')
@@ -28,11 +123,17 @@ class Repository(dict):
             logging.warning(
                 f'No PRIVATE_ACCESS_TOKEN for {self.uri.netloc} - skipping stats.')
             return
-        r = requests.get(
-            f'https://api.github.com/repos/{self.owner}/{self.name}',
-            headers={
-                'Authorization': f'token {self.gh_token}'
-            })
+        r = gh.get(f'/repos/{self.owner}/{self.name}', self.etag)
+        if r is None or r.status_code not in [200, 304]:
+            logging.warning(
+                f'Could not get stats for {self.owner}/{self.name} ({r.status_code if r is not None else "no response"}).')
+            self.status = 'failed'
+            return
+        if r.status_code == 304:
+            self.status = 'not-modified'
+            return
+        self.status = 'fetched'
+        self.etag = r.headers.get('ETag')
         j = r.json()
         for prop in self:
             p = j.get(prop)
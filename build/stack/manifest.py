@@ -0,0 +1,98 @@
+import hashlib
+import json
+import logging
+import os
+from .profiler import PROFILER
+from .structured_data import load_dict, dump_dict
+from .util import mkdir_p
+
+
+class Manifest(dict):
+    """
+    Records the inputs each generated page was built from, so pages whose source,
+    command entry and build settings are unchanged can be skipped by a rebuild.
+    """
+    VERSION = 1
+
+    def __init__(self, filepath: str, force: bool = False):
+        super().__init__()
+        self._filepath = filepath
+        self._settings = None
+        self._clean = set()
+        self._dirty = {}
+        self['settings'] = None
+        self['files'] = {}
+        if filepath and not force and os.path.isfile(filepath):
+            self.update(load_dict(filepath))
+
+    @staticmethod
+    def digest(*parts) -> str:
+        h = hashlib.sha256()
+        for part in parts:
+            if type(part) is not bytes:
+                part = json.dumps(part, sort_keys=True, default=str).encode('utf-8')
+            h.update(part)
+        return h.hexdigest()
+
+    @staticmethod
+    def file_digest(path: str) -> str:
+        with open(path, 'rb') as f:
+            data = f.read()
+        PROFILER.count('bytes_read', len(data))
+        return hashlib.sha256(data).hexdigest()
+
+    def set_settings(self, settings: dict) -> None:
+        """ Sets the build-wide inputs - any change invalidates every recorded page """
+        self._settings = Manifest.digest(Manifest.VERSION, settings)
+        if self.get('settings') != self._settings:
+            if self.get('files'):
+                logging.info(f'Build settings changed - rebuilding all {len(self["files"])} pages')
+            self['settings'] = self._settings
+            self['files'] = {}
+
+    def key(self, src: str, *parts) -> str:
+        """ Returns the key of a page built from the `src` file and extra inputs """
+        return Manifest.digest(self._settings, Manifest.file_digest(src), *parts)
+
+    def _unchanged(self, path: str, key: str = None) -> bool:
+        entry = self['files'].get(path)
+        if not entry or (key and entry.get('key') != key):
+            return False
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return False
+        return st.st_size == entry.get('size') and st.st_mtime_ns == entry.get('mtime')
+
+    def check(self, path: str, key: str) -> bool:
+        """ Returns True if `path` was built from `key` and not touched since, else marks it dirty """
+        path = os.path.normpath(path)
+        if path not in self._dirty and self._unchanged(path, key):
+            self._clean.add(path)
+            return True
+        self._clean.discard(path)
+        self._dirty[path] = key
+        return False
+
+    def invalidate(self, path: str) -> None:
+        """ Rebuilds a clean page anyway, for inputs its key doesn't cover """
+        path = os.path.normpath(path)
+        if path in self._clean:
+            self._clean.discard(path)
+            self._dirty[path] = self['files'][path].get('key')
+
+    def is_clean(self, path: str) -> bool:
+        path = os.path.normpath(path)
+        return path in self._clean and self._unchanged(path)
+
+    def persist(self) -> None:
+        files = {path: self['files'][path] for path in self._clean if self._unchanged(path)}
+        for path, key in self._dirty.items():
+            if os.path.isfile(path):
+                st = os.stat(path)
+                files[path] = {'key': key, 'size': st.st_size, 'mtime': st.st_mtime_ns}
+        logging.info(
+            f'Persisting build manifest: {self._filepath} ({len(self._clean)} unchanged, {len(self._dirty)} rebuilt)')
+        self['files'] = files
+        mkdir_p(os.path.dirname(self._filepath))
+        dump_dict(self._filepath, self)
@@ -2,10 +2,57 @@ import logging
 import os
 import re
 from .structured_data import StructuredData
-from .syntax import Command
+from .profiler import PROFILER
+from .syntax import render
 from .util import die, command_filename
 
 
+class CommandIndex:
+    """
+    Command names, page links and argument tokens, computed once for linking back-ticked
+    commands in every page. Holds only plain data, so it can be sent to worker processes.
+    """
+    MATCHER = re.compile(r'`(!?)([A-Z][A-Z-_ \.]*)`')
+
+    def __init__(self, commands: dict):
+        self._links = {
+            name: f'[`{name}`](/commands/{command_filename(name)})' for name in commands}
+        self._excludes = {
+            name: frozenset(CommandIndex.get_command_tokens(data) | {name}) for name, data in commands.items()}
+
+    @staticmethod
+    def get_command_tokens(arguments) -> set:
+        """ Extract tokens from command arguments """
+        tokens = set()
+        stack = [arguments]
+        while stack:
+            arg = stack.pop()
+            if type(arg) is list:
+                stack.extend(arg)
+                continue
+            if 'token' in arg:
+                tokens.add(arg['token'])
+            stack.extend(arg.get('arguments', []))
+        return tokens
+
+    def linkify(self, payload: str, name: str = None) -> str:
+        """
+        Converts valid ticked command names to markdown links, excluding the command in
+        the context and its arguments' tokens, and unescapes `!COMMAND` ticks.
+        """
+        links = self._links
+        exclude = self._excludes.get(name, ()) if name else ()
+
+        def rep(m):
+            command = m.group(2)
+            if m.group(1):
+                return f'`{command}`'
+            if command in links and command not in exclude:
+                return links[command]
+            return m.group(0)
+        return CommandIndex.MATCHER.sub(rep, payload)
+
+
 class Markdown:
     FM_TYPES = {
         '{\n': {
@@ -32,6 +79,7 @@ class Markdown:
         if not self.filepath or not os.path.exists(self.filepath):
             return
         with open(self.filepath, 'r') as f:
+            PROFILER.count('bytes_read', os.fstat(f.fileno()).st_size)
             payload = f.readlines()
         if len(payload) == 0:
             self.fm_type = self.FM_TYPES.get('---\n')
@@ -105,50 +153,11 @@ class Markdown:
 
         with open(self.filepath, 'w') as f:
             f.write(payload)
+        PROFILER.count('bytes_written', os.path.getsize(self.filepath))
 
-    @staticmethod
-    def get_command_tokens(arguments: dict) -> set:
-        """ Extract tokens from command arguments """
-        rep = set()
-        if type(arguments) is list:
-            for arg in arguments:
-                rep = rep.union(Markdown.get_command_tokens(arg))
-        else:
-            if 'token' in arguments:
-                rep.add(arguments['token'])
-            if 'arguments' in arguments:
-                for arg in arguments['arguments']:
-                    rep = rep.union(Markdown.get_command_tokens(arg))
-        return rep
-
-    @staticmethod
-    def make_command_linkifier(commands: dict, name: str):
-        """
-        Returns a function (for re.sub) that converts valid ticked command names to
-        markdown links. This excludes the command in the context, as well as any of
-        its arguments' tokens.
-        """
-        if name:
-            exclude = set([name])
-            tokens = Markdown.get_command_tokens(commands.get(name))
-            exclude.union(tokens)
-        else:
-            exclude = set()
-
-        def linkifier(m):
-            command = m.group(1)
-            if command in commands and command not in exclude:
-                return f'[`{command}`](/commands/{command_filename(command)})'
-            else:
-                return m.group(0)
-        return linkifier
-
-    def generate_commands_links(self, name: str, commands: dict, payload: str) -> str:
+    def generate_commands_links(self, name: str, index: CommandIndex, payload: str) -> str:
         """ Generate markdown links for back-ticked commands """
-        linkifier = Markdown.make_command_linkifier(commands, name)
-        rep = re.sub(r'`([A-Z][A-Z-_ \.]*)`', linkifier, payload)
-        rep = re.sub(r'`!([A-Z][A-Z-_ \.]*)`', lambda x: f'`{x[1]}`', rep)
-        return rep
+        return index.linkify(payload, name)
 
     @staticmethod
     def get_cli_shortcode(m):
@@ -202,42 +211,42 @@ class Markdown:
                      '## Return\n', rep)
         return rep
 
-    def add_command_frontmatter(self, name, commands):
+    def add_command_frontmatter(self, name, commands, index, rendered=None):
         """ Sets a JSON FrontMatter payload for a command page """
         data = commands.get(name)
-        c = Command(name, data)
+        rendered = rendered or render(name, data)
         data.update({
             'title': name,
             'linkTitle': name,
             'description': data.get('summary'),
-            'syntax_str': str(c),
-            'syntax_fmt': c.syntax(),
-            'hidden': c.isPureContainer() or c.isHelpCommand()
+            'syntax_str': rendered.get('syntax_str'),
+            'syntax_fmt': rendered.get('syntax_fmt'),
+            'hidden': rendered.get('hidden')
         })
         if 'replaced_by' in data:
             data['replaced_by'] = self.generate_commands_links(
-                name, commands, data.get('replaced_by'))
+                name, index, data.get('replaced_by'))
         self.fm_type = self.FM_TYPES.get('---\n')
         self.fm_ext = self.fm_type.get('ext')
         self.fm_data.update(data)
 
-    def process_command(self, name, commands):
+    def process_command(self, name, commands, index: CommandIndex = None, rendered: dict = None):
         """ New command processing logic """
         logging.debug(f'Processing command {self.filepath}')
+        index = index or CommandIndex(commands)
         self.payload = self.generate_commands_links(
-            name, commands, self.payload)
+            name, index, self.payload)
         self.payload = self.convert_command_sections(self.payload)
         self.payload = self.convert_reply_shortcuts(self.payload)
         self.payload = self.convert_cli_snippets(self.payload)
-        self.add_command_frontmatter(name, commands)
-        self.persist()
+        self.add_command_frontmatter(name, commands, index, rendered)
 
-    def process_doc(self, commands):
+    def process_doc(self, commands, index: CommandIndex = None):
         """ New doc processing logic """
         logging.debug(f'Processing document {self.filepath}')
+        index = index or CommandIndex(commands)
         self.payload = self.generate_commands_links(
-            None, commands, self.payload)
-        self.persist()
+            None, index, self.payload)
 
     def patch_module_paths(self, module_id: str, module_path) -> None:
         """ Replaces absolute module documentation links """
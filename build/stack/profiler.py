@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Profiler:
+    """
+    Collects build phase timings and I/O counters, and reports them as a Chrome trace
+    (load the JSON in chrome://tracing or https://ui.perfetto.dev).
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._events = []
+        self._phases = {}
+        self.counters = {
+            'subprocesses': 0,
+            'bytes_read': 0,
+            'bytes_written': 0,
+        }
+
+    def _ts(self) -> float:
+        return (time.perf_counter() - self._start) * 1e6
+
+    @contextmanager
+    def phase(self, name: str, cat: str = 'build', **args):
+        """ Times the enclosed block as a trace event and adds it to the `cat` totals """
+        ts = self._ts()
+        try:
+            yield
+        finally:
+            dur = self._ts() - ts
+            with self._lock:
+                self._events.append({
+                    'name': name,
+                    'cat': cat,
+                    'ph': 'X',
+                    'ts': ts,
+                    'dur': dur,
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                    'args': args,
+                })
+                total = self._phases.setdefault(cat, {'count': 0, 'seconds': 0.0})
+                total['count'] += 1
+                total['seconds'] += dur / 1e6
+
+    def count(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def report(self) -> dict:
+        with self._lock:
+            ts = self._ts()
+            counters = [{
+                'name': name,
+                'ph': 'C',
+                'ts': ts,
+                'pid': os.getpid(),
+                'args': {name: value},
+            } for name, value in self.counters.items()]
+            return {
+                'traceEvents': self._events + counters,
+                'displayTimeUnit': 'ms',
+                'seconds': ts / 1e6,
+                'counters': dict(self.counters),
+                'phases': {cat: dict(total) for cat, total in self._phases.items()},
+            }
+
+    def persist(self, filepath: str) -> None:
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        with open(filepath, 'w') as f:
+            json.dump(self.report(), f)
+
+
+PROFILER = Profiler()
@@ -4,6 +4,7 @@ import os
 import pytoml
 import yaml
 from typing import Any
+from .profiler import PROFILER
 
 
 class StructuredData:
@@ -64,6 +65,7 @@ def load_dict(filepath: str) -> dict:
     # _, name = os.path.split(filepath)
     _, ext = os.path.splitext(filepath)
     with open(filepath, 'r') as f:
+        PROFILER.count('bytes_read', os.fstat(f.fileno()).st_size)
         o = StructuredData.load(ext, f)
     return o
 
@@ -72,3 +74,4 @@ def dump_dict(filepath: str, d: dict) -> None:
     _, ext = os.path.splitext(filepath)
     with open(filepath, 'w') as f:
         StructuredData.dump(ext, d, f)
+    PROFILER.count('bytes_written', os.path.getsize(filepath))
@@ -1,9 +1,18 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from io import StringIO
 from re import M
 from textwrap import fill
 from typing import List
+import railroad
 from railroad import *
+from .manifest import Manifest
+from .structured_data import load_dict, dump_dict
+from .util import mkdir_p
 
 # Non-breaking space
 NBSP = '\xa0'
@@ -182,3 +191,71 @@ class Command(Argument):
             y = s.find('"', x + len(a))
             s = s[:x-1] + s[y+1:]
         return s
+
+
+def render(cname: str, data: dict, max_width: int = 640) -> dict:
+    """ Renders a command's syntax strings and diagram """
+    c = Command(cname, data, max_width)
+    return {
+        'syntax_str': str(c),
+        'syntax_fmt': c.syntax(),
+        'hidden': c.isPureContainer() or c.isHelpCommand(),
+        'diagram': c.diagram(),
+    }
+
+
+def _render_item(item: tuple) -> tuple:
+    key, cname, data, max_width = item
+    return key, render(cname, data, max_width)
+
+
+class DiagramCache(dict):
+    """
+    Rendered syntax and diagrams by a hash of the command's name, argument spec and
+    width, and of the renderer's code, persisted between builds. Misses are rendered
+    in a process pool.
+    """
+
+    def __init__(self, filepath: str = None, jobs: int = 1, max_width: int = 640):
+        super().__init__()
+        self._filepath = filepath
+        self._jobs = jobs
+        self._max_width = max_width
+        self._keys = {}
+        self._code = [Manifest.file_digest(__file__), Manifest.file_digest(railroad.__file__)]
+        if filepath and os.path.isfile(filepath):
+            self.update(load_dict(filepath))
+
+    def key(self, cname: str, data: dict) -> str:
+        spec = {
+            'code': self._code,
+            'name': cname,
+            'arguments': data.get('arguments'),
+            'arity': data.get('arity'),
+            'max_width': self._max_width,
+        }
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def render(self, commands: dict) -> None:
+        """ Makes sure every command is rendered """
+        misses = []
+        for cname, data in commands.items():
+            key = self.key(cname, data)
+            self._keys[cname] = key
+            if key not in self:
+                misses.append((key, cname, data, self._max_width))
+        logging.info(f'Rendering {len(misses)} of {len(commands)} command diagrams')
+        if self._jobs > 1 and len(misses) > 1:
+            with ProcessPoolExecutor(max_workers=self._jobs) as pool:
+                self.update(pool.map(_render_item, misses, chunksize=16))
+        else:
+            self.update(map(_render_item, misses))
+
+    def rendered(self, cname: str) -> dict:
+        return self[self._keys[cname]]
+
+    def persist(self) -> None:
+        if not self._filepath:
+            return
+        mkdir_p(os.path.dirname(self._filepath))
+        dump_dict(self._filepath, {key: self[key] for key in self._keys.values()})
@@ -1,5 +1,6 @@
 from contextlib import contextmanager
 import errno
+import fnmatch
 import logging
 import os
 import re
@@ -10,6 +11,7 @@ import tempfile
 import unicodedata
 from textwrap import TextWrapper
 from urllib.request import urlopen
+from .profiler import PROFILER
 
 # ------------------------------------------------------------------------------
 # Utilites
@@ -87,6 +89,7 @@ def run(cmd, cwd=None, nop=None, _try=False):
     sys.stdout.flush()
     if nop:
         return
+    PROFILER.count('subprocesses')
     sp = subprocess.Popen(["bash", "-e", "-c", cmd],
                           cwd=cwd,
                           stdout=subprocess.PIPE,
@@ -105,12 +108,120 @@ def die(msg: str = 'aborting - have a nice day!') -> None:
     exit(1)
 
 
-def rsync(src: str, dst: str, exclude: list = ['.*'], include: list = ['*']):
-    ex = [f'"{x}"' for x in exclude]
-    ix = [f'"{x}"' for x in include]
-    cmd = f'rsync -av --no-owner --no-group --include={{{",".join(ix)}}} --exclude={{{",".join(ex)}}} {src} {dst}'
-    ret = run(cmd)
-    return ret.split('\n')
+def _filtered(name: str, exclude: list, include: list) -> bool:
+    """ rsync filter rules: the first matching include or exclude pattern wins """
+    for pattern in include:
+        if fnmatch.fnmatch(name, pattern):
+            return False
+    for pattern in exclude:
+        if fnmatch.fnmatch(name, pattern):
+            return True
+    return False
+
+
+def _unchanged(src: str, dst: str) -> bool:
+    """ rsync's quick check: same type, size and modification time """
+    try:
+        s, d = os.lstat(src), os.lstat(dst)
+    except FileNotFoundError:
+        return False
+    if os.path.islink(src):
+        return os.path.islink(dst) and os.readlink(src) == os.readlink(dst)
+    return s.st_size == d.st_size and s.st_mtime_ns == d.st_mtime_ns and not os.path.islink(dst)
+
+
+def _copy_file(src: str, dst: str) -> None:
+    """ Copies a file (or symlink) to a temporary sibling and renames it over `dst` """
+    if os.path.islink(src):
+        rm_rf(dst)
+        os.symlink(os.readlink(src), dst)
+        return
+    fd, tmp = tempfile.mkstemp(prefix=f'.{os.path.basename(dst)}.', dir=os.path.dirname(dst) or '.')
+    try:
+        with open(src, 'rb') as fsrc, os.fdopen(fd, 'wb') as fdst:
+            try:
+                left = os.fstat(fsrc.fileno()).st_size
+                while left > 0:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), left)
+                    if n == 0:
+                        break
+                    left -= n
+            except (AttributeError, OSError):
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+                shutil.copyfileobj(fsrc, fdst)
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+        size = os.path.getsize(dst)
+        PROFILER.count('bytes_read', size)
+        PROFILER.count('bytes_written', size)
+    except BaseException:
+        rm_rf(tmp)
+        raise
+
+
+def sync(src, dst: str, exclude: list = ['.*'], include: list = ['*'], skip: list = None) -> list:
+    """
+    Copies files like `rsync -a`. `src` is a path or a list of paths: a directory with a
+    trailing slash copies its contents into `dst`, a directory without one copies itself,
+    and a file goes into `dst` when that is a directory (or ends with a slash), else to it.
+    Files are filtered by name like rsync's --include/--exclude, and paths in `skip`
+    (relative to a directory `src`) are left untouched. Files with the same size and
+    modification time are not copied again.
+    Returns the paths of the copied files, relative to where they were copied to.
+    """
+    skip = set(skip or [])
+    dirs, copies = set(), []
+    for s in ([src] if type(src) is str else src):
+        if not os.path.lexists(s):
+            die(f'sync: {s} does not exist - aborting.')
+        if os.path.isdir(s) and not os.path.islink(s):
+            if s.endswith('/'):
+                base, prefix = dst, ''
+            else:
+                base, prefix = os.path.join(dst, os.path.basename(s)), f'{os.path.basename(s)}/'
+            for root, subdirs, files in os.walk(s):
+                rel = os.path.relpath(root, s)
+                dirs.add(os.path.normpath(os.path.join(base, rel)))
+                subdirs[:] = sorted([d for d in subdirs if not _filtered(d, exclude, include)])
+                links = [d for d in subdirs if os.path.islink(os.path.join(root, d))]
+                subdirs[:] = [d for d in subdirs if d not in links]
+                for f in sorted(files + links):
+                    r = os.path.normpath(os.path.join(rel, f))
+                    if _filtered(f, exclude, include) or r in skip:
+                        continue
+                    copies.append((os.path.join(root, f), os.path.join(base, r), f'{prefix}{r}'))
+        elif not _filtered(os.path.basename(s), exclude, include):
+            if dst.endswith('/') or os.path.isdir(dst):
+                d = os.path.join(dst, os.path.basename(s))
+            else:
+                d = dst
+            dirs.add(os.path.dirname(d))
+            copies.append((s, d, os.path.basename(s)))
+
+    for d in sorted(dirs):
+        mkdir_p(d)
+    changed = []
+    for s, d, rel in copies:
+        if not _unchanged(s, d):
+            _copy_file(s, d)
+            changed.append(rel)
+    logging.debug(f'sync: {len(changed)} of {len(copies)} files copied to {dst}')
+    return changed
+
+
+def find(path: str, ext: str = '', exclude: str = None) -> list:
+    """ Returns the sorted paths of the files under `path` that end with `ext` """
+    found = []
+    exclude = exclude and os.path.normpath(exclude)
+    for root, dirs, files in os.walk(path):
+        if exclude and os.path.normpath(root) == exclude:
+            dirs[:] = []
+            continue
+        found += [os.path.join(root, f) for f in files if f.endswith(ext)]
+    found.sort()
+    return found
 
 
 def log_func(args: list) -> None:
@@ -181,11 +292,13 @@ def command_filename(name: str) -> str:
 
 def regex_in_file(path: str, search: str, replace: str):
     with open(path, 'r') as f:
+        PROFILER.count('bytes_read', os.fstat(f.fileno()).st_size)
         p = f.read()
     r = re.compile(search)
     p = r.sub(replace, p)
     with open(path, 'w') as f:
         f.write(p)
+    PROFILER.count('bytes_written', os.path.getsize(path))
 
 def slugify(value, allow_unicode=False):
     """